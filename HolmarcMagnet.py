@@ -1,8 +1,63 @@
+import asyncio
+import atexit
+import logging
+import os
 import pyvisa
 import time
 import numpy as np
 import pandas as pd
 
+try:
+    import numba
+except ImportError:  # Optional, only speeds up encoding long sweeps
+    numba = None
+
+log = logging.getLogger(__name__)
+
+_RM = None
+
+def _get_rm():
+    """Returns the VISA resource manager shared by all controllers."""
+    global _RM
+    if _RM is None:
+        _RM = pyvisa.ResourceManager()
+    return _RM
+
+@atexit.register
+def _close_rm():
+    if _RM is not None:
+        _RM.close()
+
+def _encode_currents(currents, coeffs):
+    """Encodes a float64 array of currents into (N, 4) uint8 value bytes."""
+    c3, c2, c1, c0 = coeffs
+    out = np.empty((currents.size, 4), np.uint8)
+    for i in range(currents.size):
+        a = currents[i]
+        pos = 1 if a >= 0 else 0
+        amp = a if pos else -a
+        raw = int(((c3*amp + c2)*amp + c1)*amp + c0)
+        raw = (raw if raw > 0 else 0) & 0xFFFF
+        out[i, 0] = (raw >> 8) & 0xFF
+        out[i, 1] = raw & 0xFF
+        out[i, 2] = 0
+        out[i, 3] = pos
+    return out
+
+if numba is not None:
+    _encode_currents = numba.njit(cache=True)(_encode_currents)
+
+def _build_current_lut(coeffs, max_amps, steps):
+    """
+    Precomputes value bytes for |amps| = 0, 1/steps, ..., max_amps.
+    Returns one table per sign byte, indexed as lut[pos][i]. Rows are
+    tuples so the shared table cannot be modified through a caller.
+    """
+    amps = np.arange(int(max_amps*steps) + 1) / steps
+    raw = np.clip(np.polyval(coeffs, amps), 0, None).astype(np.int64) & 0xFFFF
+    return tuple(tuple(((r >> 8) & 0xFF, r & 0xFF, 0x00, pos) for r in raw.tolist())
+                 for pos in (0, 1))
+
 class Controller:
     """
     A PyVISA-based controller for the Holmarc EM-series electromagnet
@@ -10,41 +65,108 @@ class Controller:
     
     Protocol: 19200 Baud, 8-N-1, Raw Byte Commands
     """
-    startup_delay_sec = -2.0  # Time to wait 
+    __slots__ = ('resource_name', 'baud_rate', 'inst', 'rm',
+                 'startup_delay_sec', 'settle_sec', 'chunk_size',
+                 '_rx', '_settle_start', '_last_amps', '_last_bytes',
+                 '_cal_fields', '_cal_currents', '_cal_mtime')
+
+    _CAL_FILE = 'field_calibration_data.csv'  # Written by field_calibration.py
+    # Currents swept by current_map_test, -0.4 to 0.3 A in 0.1 A steps.
+    # Built from integer steps, so there is no arange drift and no -0.0
+    _DEFAULT_SWEEP = tuple(k/10 for k in range(-4, 4))
+
+    # Protocol command bytes, allocated once
+    _B_READY = b'\x64'
+    _B_START = b'\x1E'
+    _B_SET = b'\x2C'
+    _B_END = b'\x00'
+    _B_STOP = b'\x2B'
+    _B_QUERY = b'\x0A'
+    _B_4E = b'\x4E'
+    _B_FIN = b'\x82'
+    _B_READY2 = _B_READY + _B_READY
+    _B_READY_SET = _B_READY + _B_SET
+    _B_FINISH = _B_4E + _B_END + _B_READY
+
+    # Cubic fit of raw set-point value against |current| in Amps
+    # Linear fit was int((1299-35)/(4.0-0.1)*amp)
+    _CURRENT_POLY = (4.76264, 2.00444, 252.08648, -8.46937)
+    # Value bytes on a 0.01 A grid over the +-4 A operating range
+    _LUT_STEPS = 100
+    _CURRENT_LUT = _build_current_lut(_CURRENT_POLY, 4.0, _LUT_STEPS)
 
     def _current_map(self,current_amps):
         """Returns the 4-byte value array for a given current in Amps."""
-        def map_func(amp):
-            # amp = int((1299-35)/(4.0-0.1)*amp)
-            amp = 4.76264*amp**3 + 2.00444*amp**2 + 252.08648*amp - 8.46937
-            print(amp)
-            return int(amp)
-        pos = 1
-        if current_amps<0:
-            current_amps = abs(current_amps)
-            pos = 0
-        mapped = hex(map_func(current_amps))
-        return_list = [0x00]*4
-        try:
-            return_list[1] = int(mapped[-2:],16)
-        except ValueError:
-            return_list[1] = 0
-        if (zeroth:=mapped.split('x')[1][:-2])!='':
-            return_list[0] = int(zeroth,16)
-        return_list[-1] = pos
-        return return_list
-
-    def __init__(self, resource_name='ASRL5::INSTR'):
+        # One sign test gives both the sign byte and |amps|, Horner form
+        # avoids the pow calls and matches np.polyval in _current_map_batch
+        pos = 1 if current_amps >= 0 else 0
+        amp = current_amps if pos else -current_amps
+        # The cache and the LUT hold tuples; callers get a fresh list.
+        # Keyed on the sign too, rounding alone turns -1e-5 into 0.0
+        key = (pos, round(amp, 4))  # absorbs np.arange float drift
+        if key == self._last_amps:
+            return list(self._last_bytes)
+        # Currents that sit exactly on the LUT grid are a table load
+        i = int(amp*self._LUT_STEPS + 0.5)
+        if i < len(self._CURRENT_LUT[pos]) and i/self._LUT_STEPS == amp:
+            self._last_amps = key
+            self._last_bytes = self._CURRENT_LUT[pos][i]
+            return list(self._last_bytes)
+        c3, c2, c1, c0 = self._CURRENT_POLY
+        raw = int(((c3*amp + c2)*amp + c1)*amp + c0)
+        raw = (raw if raw > 0 else 0) & 0xFFFF
+        self._last_amps = key
+        self._last_bytes = ((raw >> 8) & 0xFF, raw & 0xFF, 0x00, pos)
+        return list(self._last_bytes)
+
+    def _current_map_batch(self, currents_amps):
+        """Returns an (N, 4) uint8 array of value bytes, one row per current."""
+        currents = np.ascontiguousarray(currents_amps, dtype=np.float64).ravel()
+        if numba is not None:
+            return _encode_currents(currents, self._CURRENT_POLY)
+        raw = np.polyval(self._CURRENT_POLY, np.abs(currents))
+        raw = np.bitwise_and(np.clip(raw, 0, None).astype(np.int64), 0xFFFF)
+        out = np.zeros((currents.size, 4), dtype=np.uint8)
+        out[:, 0] = np.bitwise_and(np.right_shift(raw, 8), 0xFF)
+        out[:, 1] = np.bitwise_and(raw, 0xFF)
+        out[:, 3] = currents >= 0
+        return out
+
+    def __init__(self, resource_name='ASRL5::INSTR', settle_sec=2.0,
+                 chunk_size=4096, startup_delay_sec=-2.0):
         self.resource_name = resource_name
         self.baud_rate = 19200
+        self.startup_delay_sec = startup_delay_sec  # Time to wait 
+        self.settle_sec = settle_sec  # Time for the field to settle after a START sequence
+        self.chunk_size = chunk_size  # VISA read chunk, well above any response length
         self.inst = None
-        self.rm = pyvisa.ResourceManager()
-        self.connect()
+        self._rx = b''  # Bytes read past an ack, not yet consumed
+        self._settle_start = None
+        self._last_amps = None
+        self._last_bytes = None
+        self._cal_fields = None
+        self._cal_currents = None
+        self._cal_mtime = None
+        self.rm = None  # Fetched on connect, offline use never loads VISA
+
+    def __enter__(self):
+        self._ensure_connected()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.disconnect()
+        return False
 
     def connect(self):
-        """Initializes and configures the serial connection."""
+        """
+        Initializes and configures the serial connection.
+        Does nothing if the connection is already open.
+        """
+        if self.inst is not None:
+            return True
         print(f"Connecting to {self.resource_name} at {self.baud_rate} baud...")
         try:
+            self.rm = _get_rm()
             self.inst = self.rm.open_resource(self.resource_name)
             self.inst.baud_rate = self.baud_rate
             self.inst.data_bits = 8
@@ -53,58 +175,91 @@ class Controller:
             self.inst.write_termination = None
             self.inst.read_termination = None
             self.inst.timeout = 2000  # 2-second timeout
+            self.inst.chunk_size = self.chunk_size
             self.inst.clear()
+            self._rx = b''
             print("Connection successful.")
             return True
         except pyvisa.errors.VisaIOError as e:
             print(f"--- VISA Error: Could not connect ---")
             print(f"Details: {e}")
             print("Is the device plugged in and is the proprietary software closed?")
+            if self.inst is not None:
+                # Opened but could not be configured, release the port
+                self.inst.close()
+                self.inst = None
             return False
 
+    def _ensure_connected(self):
+        """Opens the connection on first use."""
+        if self.inst is None and not self.connect():
+            raise ConnectionError(f"Could not connect to {self.resource_name}")
+
     def disconnect(self):
         """Closes the connection."""
         if self.inst:
             self.inst.close()
-        self.rm.close()
-        print("Resource manager closed.")
+            self.inst = None
+        print("Connection closed.")
 
-    def _read_one_byte(self):
-        """Reads a single byte, returns int or None."""
+    def _read_bytes(self, count):
+        """
+        Reads `count` bytes in a single call, returns bytes or None.
+        Bytes left over from _poll_for_byte are served first.
+        """
+        head, self._rx = self._rx[:count], self._rx[count:]
+        if len(head) == count:
+            return head
         try:
-            return self.inst.read_bytes(1)[0]
+            return head + self.inst.read_bytes(count - len(head))
         except pyvisa.errors.VisaIOError:
             return None
 
     def _poll_for_byte(self, expected_byte):
-        """Keeps reading until a specific byte is found or timeout."""
+        """
+        Keeps reading until a specific byte is found or timeout.
+        Blocks on one byte; if that is not the expected byte, anything
+        else already buffered is drained in one read instead of one
+        byte per read. Bytes drained past the expected byte are kept in
+        self._rx for the next read, as the byte-at-a-time loop left them.
+        """
         try:
             while True:
-                response = self.inst.read_bytes(1)[0]
-                if response == expected_byte:
-                    return response
+                if self._rx:
+                    response, self._rx = self._rx, b''
+                else:
+                    response = self.inst.read_bytes(1)
+                    if response[0] != expected_byte:
+                        pending = self.inst.bytes_in_buffer
+                        if pending:
+                            response += self.inst.read_bytes(pending)
+                idx = response.find(expected_byte)
+                if idx >= 0:
+                    self._rx = response[idx+1:]
+                    return expected_byte
         except pyvisa.errors.VisaIOError:
             return None
 
     def _run_start_sequence(self, value_bytes):
         """Sends the full 10-step START sequence."""
-        print(f"  Sending START sequence: {[f'0x{b:02X}' for b in value_bytes]}")
+        self._ensure_connected()
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Sending START sequence: [%s]",
+                      ', '.join(f'0x{b:02X}' for b in bytes(value_bytes)))
         
-        self.inst.write_raw(bytes([0x64])); self._read_one_byte() # 1. Ready
-        self.inst.write_raw(bytes([0x64])); self._read_one_byte() # 2. Ready
-        self.inst.write_raw(bytes([0x1E])); self._poll_for_byte(0x12) # 3. Start
-        self.inst.write_raw(bytes([0x64])); self._read_one_byte() # 4. Ready
-        self.inst.write_raw(bytes([0x2C])); self._read_one_byte() # 5. Set Value
+        # Steps 1-2: Ready x2, one write, drain both acks
+        self.inst.write_raw(self._B_READY2); self._read_bytes(2)
+        self.inst.write_raw(self._B_START); self._poll_for_byte(0x12) # 3. Start
         
-        # Steps 6-9: Send the 4-byte value
-        self.inst.write_raw(bytes([value_bytes[0]])); self._read_one_byte()
-        self.inst.write_raw(bytes([value_bytes[1]])); self._read_one_byte()
-        self.inst.write_raw(bytes([value_bytes[2]])); self._read_one_byte()
-        self.inst.write_raw(bytes([value_bytes[3]])); self._read_one_byte()
+        # Steps 4-9: Ready, Set Value and the 4-byte value in one write
+        self.inst.write_raw(self._B_READY_SET + bytes(value_bytes)); self._read_bytes(6)
         
-        # Step 10: End Command
-        self.inst.write_raw(bytes([0x00])); self._poll_for_byte(0x12)
-        print("  START sequence complete.")
+        # Step 10: End Command. Settling starts once the end byte is out,
+        # not once the trailing ack has been read back.
+        self.inst.write_raw(self._B_END)
+        self._settle_start = time.monotonic()
+        self._poll_for_byte(0x12)
+        log.debug("START sequence complete.")
 
     def set_current(self, amps):
         """
@@ -124,59 +279,98 @@ class Controller:
         Sets the electromagnet field to a known value in mT based on
         calibration data. Run field_calibration.py to generate.
         """
-        dataframe = pd.read_csv('field_calibration_data.csv')
-        field_cal = dataframe['Field_mT'].values
-        current_cal = dataframe['Current_A'].values
-        idx = (np.abs(field_cal - field)).argmin()
-        self.set_current(current_cal[idx])
+        self.set_current(self._lookup_current(field))
 
-    def stop_and_query_field(self):
+    def load_field_calibration(self):
         """
-        Stops the current and queries the field, replicating the log sequence.
-        Returns the field reading in mT.
+        (Re)loads field_calibration_data.csv, sorted by field for searching.
+        set_field calls this itself whenever the file has changed.
+        """
+        self._cal_mtime = os.path.getmtime(self._CAL_FILE)
+        dataframe = pd.read_csv(self._CAL_FILE)
+        fields = dataframe['Field_mT'].values
+        currents = dataframe['Current_A'].values
+        # Failed queries are stored as NaN, drop them so they are never matched
+        mask = np.isfinite(fields) & np.isfinite(currents)
+        fields, currents = fields[mask], currents[mask]
+        order = np.argsort(fields, kind='stable')
+        self._cal_fields = fields[order]
+        self._cal_currents = currents[order]
+
+    def _lookup_current(self, field):
+        """Returns the calibrated current whose field is nearest to `field`."""
+        if self._cal_fields is None or os.path.getmtime(self._CAL_FILE) != self._cal_mtime:
+            self.load_field_calibration()
+        idx = int(np.searchsorted(self._cal_fields, field))
+        if idx == len(self._cal_fields):
+            idx -= 1
+        elif idx > 0 and field - self._cal_fields[idx-1] <= self._cal_fields[idx] - field:
+            idx -= 1
+        return self._cal_currents[idx]
+
+    def _query_field_bytes(self):
         """
-        print("\n  Sending STOP and QUERY sequence...")
+        Sends the QUERY command and returns the 3 response bytes
+        [mag_hi, mag_lo, sign], or None on timeout.
+        The captured log echoes each byte before the next one is sent, so
+        the reads stay interleaved with the echoes; each echo writes the
+        bytes object just read rather than rebuilding it.
+        """
+        self.inst.write_raw(self._B_QUERY) # The query
+        resp = b''
+        for _ in range(3): # Mag High, Mag Low, Sign Flag
+            byte = self._read_bytes(1)
+            if not byte: return None
+            self.inst.write_raw(byte) # Echo
+            resp += byte
+        return resp
+
+    def _stop(self):
+        """
+        Sends the full STOP sequence from the log (STOP, QUERY, finish)
+        and returns the 3 field bytes read along the way, or None if the
+        query failed. The finish bytes are sent even if the query fails
+        or raises, so the supply is always left stopped.
+        """
+        self._ensure_connected()
+        log.debug("Sending STOP and QUERY sequence...")
         
         # --- Part 1: Send STOP command ---
-        self.inst.write_raw(bytes([0x64])); self._read_one_byte() # Ready Check
-        self.inst.write_raw(bytes([0x2B])); self._poll_for_byte(0x12) # Stop Cmd
-        
-        # --- Part 2: Send QUERY command (0x0A) ---
-        self.inst.write_raw(bytes([0x0A])) # The query
-        
-        byte1 = self._read_one_byte() # Field Mag High Byte
-        if byte1 is None: return "Query Failed"
-        self.inst.write_raw(bytes([byte1])) # Echo
-        
-        byte2 = self._read_one_byte() # Field Mag Low Byte
-        if byte2 is None: return "Query Failed"
-        self.inst.write_raw(bytes([byte2])) # Echo
+        self.inst.write_raw(self._B_READY); self._read_bytes(1) # Ready Check
+        self.inst.write_raw(self._B_STOP); self._poll_for_byte(0x12) # Stop Cmd
         
-        byte3 = self._read_one_byte() # Field Sign Flag
-        if byte3 is None: return "Query Failed"
-        self.inst.write_raw(bytes([byte3])) # Echo
-
-        # --- Part 3: Finish the STOP sequence ---
-        # We use the sequence from the -1.0A log (packets_-1.txt)
-        # as it seems to be a reliable "set to zero"
-        self.inst.write_raw(bytes([0x4E])); self._read_one_byte()
-        self.inst.write_raw(bytes([0x00])); # No response in log
-        
-        self.inst.write_raw(bytes([0x64])); self._read_one_byte() # Ready Check
-        self.inst.write_raw(bytes([0x82])); self._poll_for_byte(0x12) # End Cmd
-        
-        print("  STOP/QUERY sequence complete.")
+        try:
+            # --- Part 2: Send QUERY command (0x0A) ---
+            resp = self._query_field_bytes()
+        finally:
+            # --- Part 3: Finish the STOP sequence ---
+            # We use the sequence from the -1.0A log (packets_-1.txt)
+            # as it seems to be a reliable "set to zero"
+            # 0x4E (one ack), 0x00 (no response in log), Ready Check (one ack)
+            self.inst.write_raw(self._B_FINISH); self._read_bytes(2)
+            self.inst.write_raw(self._B_FIN); self._poll_for_byte(0x12) # End Cmd
+            log.debug("STOP/QUERY sequence complete.")
+        return resp
+
+    def stop_and_query_field(self):
+        """
+        Stops the current and queries the field, replicating the log sequence.
+        Returns the field reading in mT.
+        """
+        resp = self._stop()
+        if resp is None: return "Query Failed"
+        byte1, byte2, byte3 = resp
 
         # --- Decode and return the value ---
         try:
-            raw_magnitude = (byte1 << 8) | byte2
+            raw_magnitude = int.from_bytes(resp[:2], 'big')
             scaled_magnitude = raw_magnitude / 10.0 # Our 10x scaling factor
             
             # Sign Flag: 0x01 = Negative, 0x00 = Positive
             final_value = -scaled_magnitude if byte3 == 0x01 else scaled_magnitude
             
-            print(f"  Received Bytes: [0x{byte1:02X}, 0x{byte2:02X}, 0x{byte3:02X}]")
-            print(f"  Decoded Field: {final_value} mT")
+            log.debug("Received Bytes: [0x%02X, 0x%02X, 0x%02X]", byte1, byte2, byte3)
+            log.debug("Decoded Field: %s mT", final_value)
             return final_value
         except Exception as e:
             return f"Query Failed: Error decoding bytes: {e}"
@@ -186,32 +380,23 @@ class Controller:
         Queries the field without stopping the current.
         Returns the field reading in mT.
         """
+        self._ensure_connected()
         # print("\n  Sending QUERY sequence...")
 
         # --- Part 1: Send STOP command ---
-        self.inst.write_raw(bytes([0x64])); self._read_one_byte() # Ready Check
-        self.inst.write_raw(bytes([0x2B])); self._poll_for_byte(0x12) # Stop Cmd
+        self.inst.write_raw(self._B_READY); self._read_bytes(1) # Ready Check
+        self.inst.write_raw(self._B_STOP); self._poll_for_byte(0x12) # Stop Cmd
         
         # --- Send QUERY command (0x0A) ---
-        self.inst.write_raw(bytes([0x0A])) # The query
-        
-        byte1 = self._read_one_byte() # Field Mag High Byte
-        if byte1 is None: return "Query Failed"
-        self.inst.write_raw(bytes([byte1])) # Echo
-        
-        byte2 = self._read_one_byte() # Field Mag Low Byte
-        if byte2 is None: return "Query Failed"
-        self.inst.write_raw(bytes([byte2])) # Echo
-        
-        byte3 = self._read_one_byte() # Field Sign Flag
-        if byte3 is None: return "Query Failed"
-        self.inst.write_raw(bytes([byte3])) # Echo
+        resp = self._query_field_bytes()
+        if resp is None: return "Query Failed"
+        byte1, byte2, byte3 = resp
 
         # print("  QUERY sequence complete.")
 
         # --- Decode and return the value ---
         try:
-            raw_magnitude = (byte1 << 8) | byte2
+            raw_magnitude = int.from_bytes(resp[:2], 'big')
             scaled_magnitude = raw_magnitude / 10.0 # Our 10x scaling factor
             
             # Sign Flag: 0x01 = Negative, 0x00 = Positive
@@ -224,15 +409,85 @@ class Controller:
             Warning(f"Query Failed: Error decoding bytes: {e}")
             return None
 
+    def _settle_remaining(self, settle_sec=None):
+        """Returns the seconds left of the settle time since the last START."""
+        if settle_sec is None:
+            settle_sec = self.settle_sec
+        if self._settle_start is None:
+            return settle_sec
+        return max(settle_sec - (time.monotonic() - self._settle_start), 0.0)
+
+    def _wait_for_settle(self, settle_sec=None):
+        """Sleeps out whatever is left of the settle time since the last START."""
+        time.sleep(self._settle_remaining(settle_sec))
+
+    def _sweep_step(self, packet, settle_sec=None, stop=True):
+        """
+        Sends one START packet, waits out the settle time and reads the
+        field in mT, or NaN if the query failed. With stop=False only the
+        STOP/QUERY exchange of query_field is run, not the full STOP.
+        """
+        self._run_start_sequence(packet)
+        self._wait_for_settle(settle_sec)
+        field = self.stop_and_query_field() if stop else self.query_field()
+        return field if isinstance(field, float) else np.nan
+
+    def sweep(self, currents_amps, settle_sec=None, callback=None):
+        """
+        Steps through `currents_amps` and returns the measured fields (mT)
+        as an array, with NaN where the query failed.
+        Each point is set -> settle -> query_field, one after the other;
+        the full STOP sequence runs on the last point, or from the finally
+        block if the sweep fails or is interrupted before that, so the
+        magnet is left stopped. `callback(amps, field)` is called after
+        each point.
+        """
+        currents = np.ravel(currents_amps)
+        packets = self._current_map_batch(currents)
+        fields = np.empty(len(packets))
+        last = len(packets) - 1
+        stopped = False
+        try:
+            for i, packet in enumerate(packets):
+                fields[i] = self._sweep_step(packet, settle_sec, stop=(i == last))
+                stopped = i == last
+                if callback is not None:
+                    callback(currents[i], fields[i])
+        finally:
+            if not stopped and self.inst is not None:
+                self._stop()
+        return fields
+
     def current_map_test(self):
-        currs = np.arange(-.4,.4,0.1)
-        for curr in currs:
+        """
+        Steps through the default sweep and returns the measured fields (mT)
+        as an array, with NaN where the query failed.
+        """
+        fields = np.empty(len(self._DEFAULT_SWEEP))
+        packets = self._current_map_batch(self._DEFAULT_SWEEP)
+        for i, curr in enumerate(self._DEFAULT_SWEEP):
+            print(f"--- Querying for {curr}A ---")
+            fields[i] = self._sweep_step(packets[i])
+            print(f"  Measured Field: {fields[i]} mT")
+            print("---                       ---")
+        return fields
+
+    async def acurrent_map_test(self):
+        """
+        Async variant of current_map_test. The blocking VISA calls run in a
+        worker thread, so the event loop is free while the magnet settles.
+        """
+        fields = np.empty(len(self._DEFAULT_SWEEP))
+        packets = self._current_map_batch(self._DEFAULT_SWEEP)
+        for i, curr in enumerate(self._DEFAULT_SWEEP):
             print(f"--- Querying for {curr}A ---")
-            self.set_current(curr)
-            time.sleep(2)
-            field = magnet.stop_and_query_field()
+            await asyncio.to_thread(self._run_start_sequence, packets[i])
+            await asyncio.sleep(self._settle_remaining())
+            field = await asyncio.to_thread(self.stop_and_query_field)
+            fields[i] = field if isinstance(field, float) else np.nan
             print(f"  Measured Field: {field} mT")
             print("---                       ---")
+        return fields
 
     def pulse(self, amps, duration_sec):
         """
@@ -291,7 +546,6 @@ class Controller:
 
 if __name__ == "__main__":
     """This test is buggy due to a buggy pulse() method."""
-    magnet = MagnetController(resource_name='ASRL5::INSTR')
-    magnet.pulse(3.0, 5)
-    magnet.pulse(-3.0, 5)
-    magnet.disconnect()
\ No newline at end of file
+    with Controller(resource_name='ASRL5::INSTR') as magnet:
+        magnet.pulse(3.0, 5)
+        magnet.pulse(-3.0, 5)
\ No newline at end of file
@@ -1,33 +1,31 @@
-from EM3000S import MagnetController
+from HolmarcMagnet import Controller
 import pandas as pd
 import numpy as np
-import time
 
 calibration_resolution = 100
 
 print("Connecting to Magnet Controller...")
 
-magnet = MagnetController(resource_name='ASRL5::INSTR')
-
 curr_arr = np.linspace(-4,4,calibration_resolution)
 
 data = np.zeros((calibration_resolution,2))
 
 print(f"Starting field calibration sweep for {calibration_resolution} points...")
 
-for idx,curr in enumerate(curr_arr):
-    print(f"Setting current to {curr:.2f} A")
-    magnet.set_current(curr)
-    time.sleep(2)  # Wait for the magnet to stabilize
-    field = magnet.query_field()
-    print(f"Measured field: {field:.2f} mT")
-    data[idx,0] = curr
-    data[idx,1] = field
+def report(curr, field):
+    print(f"Set current to {curr:.2f} A, measured field: {field:.2f} mT")
+
+with Controller(resource_name='ASRL5::INSTR') as magnet:
+    # Waits 2 s per point for the magnet to stabilize, stops after the last one
+    data[:,0] = curr_arr
+    data[:,1] = magnet.sweep(curr_arr, settle_sec=2, callback=report)
+
+failed = np.isnan(data[:,1])
+if failed.any():
+    print(f"Warning: {failed.sum()} field queries failed, leaving them out of the calibration.")
+    data = data[~failed]
 
 df = pd.DataFrame(data, columns=['Current_A', 'Field_mT'])
 df.to_csv('field_calibration_data.csv', index=False)
 
-magnet.stop_and_query_field()
-magnet.disconnect()
-
 print("Field calibrated and data saved to 'field_calibration_data.csv'.")
\ No newline at end of file